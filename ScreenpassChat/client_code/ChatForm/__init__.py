@@ -203,6 +203,12 @@ class ChatForm(ChatTemplate):
             
             if response.get('success'):
                 self.add_message_to_chat('Screenpass', response.get('message', ''))
+                
+                # The server ends the chat itself once the driver is disqualified
+                if response.get('chat_ended'):
+                    self.conversation_active = False
+                    self.disable_chat_controls()
+                    self.show_status('Chat ended', 'success')
             else:
                 self.add_message_to_chat('Screenpass', 'I\'m sorry, I encountered an error. Please try again.')
                 self.show_status('Error processing message', 'error')
@@ -245,10 +251,7 @@ class ChatForm(ChatTemplate):
                 self.show_status('Error ending chat', 'error')
                 
             # Disable controls
-            self.submit_btn.enabled = False
-            self.end_chat_btn.enabled = False
-            self.query_input.enabled = False
-            self.query_input.placeholder = 'Chat has ended'
+            self.disable_chat_controls()
             
         except Exception as e:
             print(f"Error ending chat: {e}")
@@ -257,7 +260,11 @@ class ChatForm(ChatTemplate):
             self.show_status('Network error', 'error')
             
             # Disable controls anyway
-            self.submit_btn.enabled = False
-            self.end_chat_btn.enabled = False
-            self.query_input.enabled = False
-            self.query_input.placeholder = 'Chat has ended'
\ No newline at end of file
+            self.disable_chat_controls()
+            
+    def disable_chat_controls(self):
+        """Disable all inputs once the chat is over"""
+        self.submit_btn.enabled = False
+        self.end_chat_btn.enabled = False
+        self.query_input.enabled = False
+        self.query_input.placeholder = 'Chat has ended'
\ No newline at end of file
@@ -3,13 +3,27 @@ import json
 import os
 from datetime import datetime
 import csv
-import requests
 import sys
+import threading
+import uuid
+
+from . import screening
+from . import sentiment
+from .funnel import FunnelAggregates
+from .llm_backends import build_registry
 
 
 # Global storage for conversation sessions
 conversation_sessions = {}
 
+# Funnel aggregates, loaded on first use
+funnel_aggregates = None
+funnel_lock = threading.Lock()
+
+# LLM backend registry, built on first use
+llm_registry = None
+llm_lock = threading.Lock()
+
 
 def load_config():
     """Load all configuration files"""
@@ -61,71 +75,212 @@ def get_company_config(company_name):
         return configs.get('companyA', {'name': 'Company A', 'yoe_required': 4, 'work_nights_per_week': 4})
 
 
+def get_funnel_aggregates():
+    """Get the in-memory funnel aggregates, rebuilding them from disk on cold start"""
+    global funnel_aggregates
+    with funnel_lock:
+        if funnel_aggregates is None:
+            server_config = load_config()['server']
+            aggregates = FunnelAggregates(snapshot_every=server_config.get('funnel_snapshot_every', 10))
+            aggregates.load()
+            funnel_aggregates = aggregates
+    return funnel_aggregates
+
+
+def get_screening_criteria(configs):
+    """Get the hard screening requirements from questions.json"""
+    return configs.get('questions', {}).get('screening_criteria') or screening.default_criteria()
+
+
+def last_agent_message(conversation_history):
+    """Find the most recent Screenpass message the trucker is replying to"""
+    for message in reversed(conversation_history[:-1]):
+        if message.startswith('>Screenpass: '):
+            return message[len('>Screenpass: '):]
+    return ""
+
+
+def record_early_exit(session, criterion_id, turns_saved):
+    """Append an early disqualification row to results/early_exits.csv"""
+    os.makedirs('results', exist_ok=True)
+    write_header = not os.path.exists('results/early_exits.csv')
+
+    with open('results/early_exits.csv', 'a', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(['timestamp', 'company', 'lead_source', 'criterion', 'trucker_turns', 'turns_saved'])
+        writer.writerow([
+            datetime.now().isoformat(),
+            session['company'],
+            session['lead_source'],
+            criterion_id,
+            session['screening']['trucker_turns'],
+            turns_saved
+        ])
+
+
+def get_llm_registry():
+    """Get the LLM backend registry, building it from server_config.json on first use"""
+    global llm_registry
+    with llm_lock:
+        if llm_registry is None:
+            registry = build_registry(load_config()['server'])
+            registry.start_health_checks()
+            llm_registry = registry
+    return llm_registry
+
+
 def call_llm(prompt, system_prompt=""):
-    """Call the OpenAI API with proper error handling"""
+    """Call the best available LLM backend with proper error handling"""
     try:
         print(f"LLM: Making API call with prompt: {prompt[:100]}...")
         print(f"LLM: System prompt: {system_prompt[:200]}...")
         
-        configs = load_config()
-        api_key = configs['server'].get('api_key', '1234')
-        
-        # If using real API key (not the mock "1234")
-        if api_key != "1234" and len(api_key) > 10:
-            headers = {
-                'Authorization': f'Bearer {api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                'model': 'gpt-3.5-turbo',
-                'messages': [
-                    {'role': 'system', 'content': system_prompt},
-                    {'role': 'user', 'content': prompt}
-                ],
-                'max_tokens': 500,
-                'temperature': 0.7
-            }
-            
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers=headers,
-                json=data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                message = result['choices'][0]['message']['content']
-                print("LLM: API call succeeded")
-                return message
-            else:
-                print(f"LLM: API call failed with status {response.status_code}: {response.text}")
-                raise Exception(f"OpenAI API error: {response.status_code}")
-                
-        else:
-            # Mock implementation for testing
-            print("LLM: Using mock implementation (API key is '1234' or invalid)")
-            mock_responses = [
-                "Hi there! I'm excited to help you explore this trucking opportunity. Let me ask you a few questions to see if this might be a good fit.",
-                "That's great! Can you tell me about your CDL and driving experience?",
-                "Excellent! How many years of driving experience do you have?",
-                "Perfect! Are you comfortable being on the road for several nights per week?",
-                "Thank you for sharing that information. Based on what you've told me, I think you'd be a great fit for this position!",
-                "I appreciate your interest. Let me tell you more about the benefits and compensation for this role.",
-                "Do you have any questions about the company or the position?",
-                "That's a great question! Let me provide you with those details."
-            ]
-            
-            import random
-            return random.choice(mock_responses)
+        return get_llm_registry().call(prompt, system_prompt)
             
     except Exception as e:
         print(f"LLM: Error in API call: {e}")
-        print("LLM: Falling back to mock response")
         return "I'm sorry, I'm having some technical difficulties. Please try again in a moment."
 
 
+def generate_summary(conversation_text):
+    """Ask the LLM for a 150 word summary of a conversation"""
+    summary_prompt = f"""
+    Please summarize the following conversation in 150 words or less:
+    
+    {conversation_text}
+    
+    Focus on key points discussed, driver qualifications, and outcome.
+    """
+    
+    return call_llm(summary_prompt)
+
+
+def llm_sentiment(conversation_text):
+    """Ask the LLM to rate customer satisfaction from 1 to 5"""
+    sentiment_prompt = f"""
+    Analyze the sentiment and customer satisfaction of this conversation on a scale of 1-5 
+    (1 = very dissatisfied, 5 = very satisfied):
+    
+    {conversation_text}
+    
+    Return only a number from 1 to 5.
+    """
+    
+    sentiment_response = call_llm(sentiment_prompt)
+    
+    # Extract sentiment score
+    try:
+        sentiment_score = int(sentiment_response.strip())
+        if sentiment_score < 1 or sentiment_score > 5:
+            sentiment_score = 3  # Default to neutral
+    except:
+        sentiment_score = 3  # Default to neutral
+    
+    return sentiment_score
+
+
+def record_sentiment_agreement(local_score, llm_score):
+    """Append a local vs LLM sentiment comparison to results/sentiment_agreement.csv"""
+    os.makedirs('results', exist_ok=True)
+    write_header = not os.path.exists('results/sentiment_agreement.csv')
+
+    with open('results/sentiment_agreement.csv', 'a', newline='') as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(['timestamp', 'local', 'llm', 'agree'])
+        writer.writerow([datetime.now().isoformat(), local_score, llm_score, local_score == llm_score])
+
+
+def score_sentiment(conversation_text):
+    """Rate customer satisfaction from 1 to 5 using the configured sentiment_mode.
+
+    'local' scores the Trucker turns on the CPU, 'llm' asks the LLM, and 'both'
+    records the LLM score while logging how often the two agree.
+    """
+    mode = load_config()['server'].get('sentiment_mode', 'local')
+    
+    if mode == 'llm':
+        return llm_sentiment(conversation_text)
+    
+    local_score = sentiment.score(conversation_text)
+    if mode != 'both':
+        return local_score
+    
+    llm_score = llm_sentiment(conversation_text)
+    print(f"LLM: Sentiment local={local_score} llm={llm_score} agree={local_score == llm_score}")
+    record_sentiment_agreement(local_score, llm_score)
+    return llm_score
+
+
+def decide_qualification(conversation_text, established_facts=None):
+    """Ask the LLM whether the driver met the qualifying criteria, returns (qualified, reason)"""
+    facts_text = ""
+    if established_facts:
+        facts_text = "Answers captured during screening:\n" + "\n".join([f"- {fact}" for fact in established_facts])
+    
+    decision_prompt = f"""
+    Based on this conversation, did the driver meet the qualifying criteria? 
+    Consider: Valid CDL, required years of experience, willingness to be on road required nights.
+    
+    {facts_text}
+    
+    {conversation_text}
+    
+    Return 'QUALIFIED' or 'NOT_QUALIFIED' followed by a brief reason.
+    """
+    
+    decision_response = call_llm(decision_prompt)
+    
+    # Parse decision
+    if 'QUALIFIED' in decision_response.upper() and 'NOT_QUALIFIED' not in decision_response.upper():
+        return True, decision_response.replace('QUALIFIED', '').strip()
+    return False, decision_response.replace('NOT_QUALIFIED', '').strip()
+
+
+def build_system_prompt(server_config, company_config, screening_state, criteria, context=None):
+    """Build the agent system prompt from company facts and the screening progress so far"""
+    agent_goals = server_config.get('agent_goals', [])
+    goals_text = "\n".join([f"- {goal}" for goal in agent_goals])
+    
+    # Include company facts
+    company_facts = f"""
+    Company Information:
+    - Name: {company_config.get('name', 'Unknown')}
+    - Role Type: {company_config.get('role_type', 'N/A')}
+    - Industry: {company_config.get('industry', 'N/A')}
+    - Location: {company_config.get('location', 'N/A')}
+    - Wage: ${company_config.get('wage', 'N/A')}/hour
+    - Expected Miles per Day: {company_config.get('expected_miles_per_day', 'N/A')}
+    - Work Hours: {company_config.get('work_start_time', 'N/A')} - {company_config.get('work_end_time', 'N/A')}
+    - Health Insurance: {company_config.get('health_insurance', 'N/A')}
+    - Dental Insurance: {company_config.get('dental_insurance', 'N/A')}
+    - Vision Insurance: {company_config.get('vision_insurance', 'N/A')}
+    - Retirement Plan: {company_config.get('retirement_plan', 'N/A')}
+    """
+    
+    sections = [server_config['agent_role'], company_facts, f"Agent Goals:\n{goals_text}"]
+    
+    facts = screening.established_facts(screening_state, criteria, company_config)
+    if facts:
+        facts_text = "\n".join([f"- {fact}" for fact in facts])
+        sections.append(f"Established Facts (already answered, do not ask again):\n{facts_text}")
+    
+    questions = screening.open_questions(screening_state, criteria, company_config)
+    if questions:
+        questions_text = "\n".join([f"- {question}" for question in questions])
+        sections.append(f"Open Screening Questions (work these into the conversation naturally, one at a time):\n{questions_text}")
+    elif screening_state['phase'] == screening.QUALIFIED:
+        sections.append("All screening questions are answered and the driver meets every requirement. "
+                        "Tell them they look like a great fit and answer any remaining questions.")
+    
+    if context is not None:
+        sections.append(f"Conversation so far:\n{context}")
+        sections.append("Respond as the Screenpass agent. Be helpful, upbeat, and professional.")
+    
+    return "\n\n".join(sections)
+
+
 @anvil.server.callable
 def init_conversation(lead_source, company, session_id):
     """Initialize conversation with lead source and company information"""
@@ -137,52 +292,15 @@ def init_conversation(lead_source, company, session_id):
         configs = load_config()
         server_config = configs['server']
         
-        # Populate system prompts with company-specific values
-        yoe_required = company_config.get('yoe_required', 1)
-        nights_per_week = company_config.get('work_nights_per_week', 4)
         company_name = company_config.get('name', company)
         
         # Format the initial prompt with company name
         initial_prompt = server_config['initial_prompt'].format(company_name)
         
-        # Create comprehensive system prompt with agent goals and company facts
-        agent_goals = server_config.get('agent_goals', [])
-        goals_text = "\n".join([f"- {goal}" for goal in agent_goals])
-        
-        # Include company facts
-        company_facts = f"""
-        Company Information:
-        - Name: {company_config.get('name', 'Unknown')}
-        - Role Type: {company_config.get('role_type', 'N/A')}
-        - Industry: {company_config.get('industry', 'N/A')}
-        - Location: {company_config.get('location', 'N/A')}
-        - Wage: ${company_config.get('wage', 'N/A')}/hour
-        - Expected Miles per Day: {company_config.get('expected_miles_per_day', 'N/A')}
-        - Work Hours: {company_config.get('work_start_time', 'N/A')} - {company_config.get('work_end_time', 'N/A')}
-        - Health Insurance: {company_config.get('health_insurance', 'N/A')}
-        - Dental Insurance: {company_config.get('dental_insurance', 'N/A')}
-        - Vision Insurance: {company_config.get('vision_insurance', 'N/A')}
-        - Retirement Plan: {company_config.get('retirement_plan', 'N/A')}
-        """
-        
-        system_prompt = f"""
-        {server_config['agent_role']}
-        
-        {company_facts}
-        
-        Requirements:
-        - Years of Experience Required: {yoe_required}
-        - Nights per week on road: {nights_per_week}
-        - Valid, unexpired CDL required
-        
-        Agent Goals:
-        {goals_text}
-        
-        Key Screening Questions (work these into the conversation naturally):
-        1) We need a driver with a valid, unexpired CDL
-        2) We need a driver with {yoe_required} years of experience, do not pass drivers who don't fit this requirement.
-        3) This job requires being on the road for {nights_per_week} nights a week. Ask if that is okay.
-        """
+        # Every question is still open at the start of the chat
+        criteria = get_screening_criteria(configs)
+        screening_state = screening.new_screening_state(criteria)
+        system_prompt = build_system_prompt(server_config, company_config, screening_state, criteria)
         
         # Store session data
         conversation_sessions[session_id] = {
@@ -190,7 +308,8 @@ def init_conversation(lead_source, company, session_id):
             'start_time': datetime.now(),
             'lead_source': lead_source,
             'company': company,
-            'company_config': company_config
+            'company_config': company_config,
+            'screening': screening_state
         }
         
         # Get initial response from LLM
@@ -229,60 +348,27 @@ def process_prompt(user_input, conversation_history, session_id):
         # Update conversation history in session
         session['history'] = conversation_history
         
-        # Build conversation context
-        context = "\n".join(conversation_history[-10:])  # Last 10 messages for context
-        
-        # Get company info for context
-        company_config = session['company_config']
-        yoe_required = company_config.get('yoe_required', 1)
-        nights_per_week = company_config.get('work_nights_per_week', 4)
-        company_name = company_config.get('name', session['company'])
-        
-        # Create comprehensive system prompt with company facts and goals
+        # Check the reply against the hard requirements before spending another LLM turn
         configs = load_config()
         server_config = configs['server']
-        agent_goals = server_config.get('agent_goals', [])
-        goals_text = "\n".join([f"- {goal}" for goal in agent_goals])
-        
-        # Include company facts
-        company_facts = f"""
-        Company Information:
-        - Name: {company_config.get('name', 'Unknown')}
-        - Role Type: {company_config.get('role_type', 'N/A')}
-        - Industry: {company_config.get('industry', 'N/A')}
-        - Location: {company_config.get('location', 'N/A')}
-        - Wage: ${company_config.get('wage', 'N/A')}/hour
-        - Expected Miles per Day: {company_config.get('expected_miles_per_day', 'N/A')}
-        - Work Hours: {company_config.get('work_start_time', 'N/A')} - {company_config.get('work_end_time', 'N/A')}
-        - Health Insurance: {company_config.get('health_insurance', 'N/A')}
-        - Dental Insurance: {company_config.get('dental_insurance', 'N/A')}
-        - Vision Insurance: {company_config.get('vision_insurance', 'N/A')}
-        - Retirement Plan: {company_config.get('retirement_plan', 'N/A')}
-        """
-        
-        system_prompt = f"""
-        {server_config['agent_role']}
-        
-        {company_facts}
-        
-        Requirements:
-        - Years of Experience Required: {yoe_required}
-        - Nights per week on road: {nights_per_week}
-        - Valid, unexpired CDL required
-        
-        Agent Goals:
-        {goals_text}
-        
-        Key Screening Questions (work these into the conversation naturally):
-        1) We need a driver with a valid, unexpired CDL
-        2) We need a driver with {yoe_required} years of experience, do not pass drivers who don't fit this requirement.
-        3) This job requires being on the road for {nights_per_week} nights a week. Ask if that is okay?
-        
-        Conversation so far:
-        {context}
-        
-        Respond as the Screenpass agent. Be helpful, upbeat, and professional.
-        """
+        criteria = get_screening_criteria(configs)
+        screening_state = session.setdefault('screening', screening.new_screening_state(criteria))
+        failed_criterion = screening.evaluate_turn(
+            screening_state,
+            criteria,
+            user_input,
+            last_agent_message(conversation_history),
+            session['company_config']
+        )
+        
+        if failed_criterion:
+            return end_disqualified_conversation(session_id, session, conversation_history, failed_criterion, server_config)
+        
+        # Only the open questions and the answers so far go into the prompt,
+        # so the recent context window can stay short
+        context_messages = server_config.get('context_messages', 6)
+        context = "\n".join(conversation_history[-context_messages:])
+        system_prompt = build_system_prompt(server_config, session['company_config'], screening_state, criteria, context)
         
         full_prompt = f"User just said: {user_input}\n\nPlease respond appropriately."
         
@@ -303,6 +389,40 @@ def process_prompt(user_input, conversation_history, session_id):
         }
 
 
+def end_disqualified_conversation(session_id, session, conversation_history, criterion, server_config):
+    """Politely close a chat with a disqualified candidate and run the end-of-chat pipeline"""
+    company_config = session['company_config']
+    company_name = company_config.get('name', session['company'])
+    requirement = screening.requirement_text(criterion, company_config)
+    
+    close_template = server_config.get(
+        'disqualification_close',
+        "Thank you for your time! Unfortunately {} requires {}, so we won't be able to move forward right now."
+    )
+    close_message = close_template.format(company_name, requirement)
+    
+    expected_turns = server_config.get('expected_screening_turns', 8)
+    turns_saved = max(expected_turns - session['screening']['trucker_turns'], 0)
+    print(f"LLM: Candidate disqualified on '{criterion['id']}', skipping ~{turns_saved} LLM turns")
+    record_early_exit(session, criterion['id'], turns_saved)
+    
+    result = summarize_conversation(
+        conversation_history + [f">Screenpass: {close_message}"],
+        session['start_time'],
+        datetime.now(),
+        session['lead_source'],
+        session['company'],
+        session_id
+    )
+    
+    return {
+        'success': True,
+        'message': close_message,
+        'chat_ended': True,
+        'summary_saved': result.get('success', False)
+    }
+
+
 @anvil.server.callable
 def summarize_conversation(conversation_history, start_time, end_time, lead_source, company, session_id):
     """Summarize conversation and perform all end-of-chat tasks"""
@@ -319,6 +439,10 @@ def summarize_conversation(conversation_history, start_time, end_time, lead_sour
                 'company': company
             }
         
+        # Load the funnel aggregates before writing any rows, otherwise a cold start
+        # would replay this chat from the CSVs and record() would count it again
+        aggregates = get_funnel_aggregates()
+        
         # Ensure results directories exist
         os.makedirs('results/audit', exist_ok=True)
         os.makedirs('results/summary', exist_ok=True)
@@ -340,17 +464,12 @@ def summarize_conversation(conversation_history, start_time, end_time, lead_sour
         
         print(f"LLM: Saved conversation audit to {audit_filename}")
         
+        # Ties this chat's sentiment and decision rows together for the funnel replay
+        chat_id = uuid.uuid4().hex
+        
         # 2. Generate summary using LLM
         conversation_text = "\n".join(conversation_history)
-        summary_prompt = f"""
-        Please summarize the following conversation in 150 words or less:
-        
-        {conversation_text}
-        
-        Focus on key points discussed, driver qualifications, and outcome.
-        """
-        
-        summary = call_llm(summary_prompt)
+        summary = generate_summary(conversation_text)
         
         # Save summary
         summary_filename = f"results/summary/summary_{timestamp_str}.txt"
@@ -365,24 +484,7 @@ def summarize_conversation(conversation_history, start_time, end_time, lead_sour
         print(f"LLM: Generated and saved summary to {summary_filename}")
         
         # 3. Perform sentiment analysis
-        sentiment_prompt = f"""
-        Analyze the sentiment and customer satisfaction of this conversation on a scale of 1-5 
-        (1 = very dissatisfied, 5 = very satisfied):
-        
-        {conversation_text}
-        
-        Return only a number from 1 to 5.
-        """
-        
-        sentiment_response = call_llm(sentiment_prompt)
-        
-        # Extract sentiment score
-        try:
-            sentiment_score = int(sentiment_response.strip())
-            if sentiment_score < 1 or sentiment_score > 5:
-                sentiment_score = 3  # Default to neutral
-        except:
-            sentiment_score = 3  # Default to neutral
+        sentiment_score = score_sentiment(conversation_text)
         
         # Append to sentiment.csv
         with open('results/sentiment.csv', 'a', newline='') as f:
@@ -390,43 +492,45 @@ def summarize_conversation(conversation_history, start_time, end_time, lead_sour
             writer.writerow([
                 datetime.now().isoformat(),
                 sentiment_score,
+                chat_id
             ])
         
         print(f"LLM: Added sentiment analysis (score: {sentiment_score}) to sentiment.csv")
         
         # 4. Determine if driver met qualifying criteria
-        decision_prompt = f"""
-        Based on this conversation, did the driver meet the qualifying criteria? 
-        Consider: Valid CDL, required years of experience, willingness to be on road required nights.
-        
-        {conversation_text}
-        
-        Return 'QUALIFIED' or 'NOT_QUALIFIED' followed by a brief reason.
-        """
-        
-        decision_response = call_llm(decision_prompt)
-        
-        # Parse decision
-        if 'QUALIFIED' in decision_response.upper() and 'NOT_QUALIFIED' not in decision_response.upper():
-            qualified = True
-            reason = decision_response.replace('QUALIFIED', '').strip()
-        else:
+        screening_state = session.get('screening', {})
+        if screening_state.get('disqualified'):
+            # Already decided during the chat, no need to ask the LLM
             qualified = False
-            reason = decision_response.replace('NOT_QUALIFIED', '').strip()
+            reason = f"Disqualified during screening: {screening_state['disqualified_by']}"
+        else:
+            established = []
+            if screening_state and 'company_config' in session:
+                established = screening.established_facts(
+                    screening_state,
+                    get_screening_criteria(load_config()),
+                    session['company_config']
+                )
+            qualified, reason = decide_qualification(conversation_text, established)
         
         # Append to decisions.csv
+        decided_at = datetime.now()
         with open('results/decisions.csv', 'a', newline='') as f:
             writer = csv.writer(f)
             writer.writerow([
-                datetime.now().isoformat(),
+                decided_at.isoformat(),
                 company,
                 lead_source,
                 qualified,
-                reason[:100]  # Limit reason length
+                reason[:100],  # Limit reason length
+                chat_id
             ])
         
         print(f"LLM: Added decision (qualified: {qualified}) to decisions.csv")
         
+        # 5. Update the running funnel aggregates
+        aggregates.record(company, lead_source, decided_at.date().isoformat(), qualified, sentiment_score)
+        
         # Clean up session from memory
         if session_id in conversation_sessions:
             del conversation_sessions[session_id]
@@ -444,4 +548,19 @@ def summarize_conversation(conversation_history, start_time, end_time, lead_sour
         return {
             'success': False,
             'error': str(e)
-        }
\ No newline at end of file
+        }
+
+
+@anvil.server.callable
+def get_funnel_stats(company, lead_source, day=None):
+    """Qualification rate and average sentiment for one company, lead source and day (default today)"""
+    day = day or datetime.now().date().isoformat()
+    stats = get_funnel_aggregates().get(company, lead_source, day)
+    stats.update({'company': company, 'lead_source': lead_source, 'day': day})
+    return stats
+
+
+@anvil.server.callable
+def get_llm_backend_status():
+    """Circuit state and latency estimate of every configured LLM backend"""
+    return get_llm_registry().status()
\ No newline at end of file
@@ -0,0 +1,153 @@
+import csv
+import json
+import os
+import threading
+import time
+
+
+def _new_bucket():
+    return {'conversations': 0, 'qualified': 0, 'sentiment_sum': 0, 'sentiment_count': 0}
+
+
+class FunnelAggregates:
+    """Running qualification and sentiment totals per (company, lead_source, day).
+
+    Updated in place as each chat is summarized and snapshotted to disk every
+    few updates. On cold start the snapshot is loaded and only the CSV rows
+    written after it are replayed; without a snapshot everything is rebuilt
+    from results/decisions.csv and results/sentiment.csv.
+    """
+
+    def __init__(self, snapshot_path='results/funnel_snapshot.json',
+                 decisions_path='results/decisions.csv', sentiment_path='results/sentiment.csv',
+                 snapshot_every=10, snapshot_interval_seconds=60):
+        self.snapshot_path = snapshot_path
+        self.decisions_path = decisions_path
+        self.sentiment_path = sentiment_path
+        self.snapshot_every = snapshot_every
+        self.snapshot_interval_seconds = snapshot_interval_seconds
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.rows_recorded = 0
+        self.updates_since_snapshot = 0
+        self.last_snapshot = time.monotonic()
+
+    @staticmethod
+    def _key(company, lead_source, day):
+        return f"{company}|{lead_source}|{day}"
+
+    def _add(self, company, lead_source, day, qualified, sentiment_score):
+        bucket = self.buckets.setdefault(self._key(company, lead_source, day), _new_bucket())
+        bucket['conversations'] += 1
+        bucket['qualified'] += 1 if qualified else 0
+        if sentiment_score is not None:
+            bucket['sentiment_sum'] += sentiment_score
+            bucket['sentiment_count'] += 1
+        self.rows_recorded += 1
+
+    def load(self):
+        """Cold start: restore the snapshot, then replay CSV rows newer than it"""
+        with self.lock:
+            self.buckets = {}
+            self.rows_recorded = 0
+            skip = 0
+
+            if os.path.exists(self.snapshot_path):
+                try:
+                    with open(self.snapshot_path, 'r') as f:
+                        snapshot = json.load(f)
+                    self.buckets = snapshot['buckets']
+                    skip = snapshot['rows_recorded']
+                except Exception as e:
+                    print(f"Error loading funnel snapshot, rebuilding from CSVs: {e}")
+                    self.buckets = {}
+                    skip = 0
+
+            self.rows_recorded = skip
+            replayed = self._replay_csvs(skip)
+            print(f"Funnel aggregates loaded: {skip} rows from snapshot, {replayed} replayed from CSVs")
+
+    def _replay_csvs(self, skip):
+        """Fold decision rows after the first `skip` into the buckets, each with its chat's sentiment row"""
+        if not os.path.exists(self.decisions_path):
+            return 0
+
+        # Rows carry a chat_id in their last column, so chats that finished in
+        # a different order in the two files still pair up. Older rows without
+        # one are paired by position among themselves.
+        sentiments_by_chat = {}
+        legacy_sentiments = []
+        if os.path.exists(self.sentiment_path):
+            with open(self.sentiment_path, 'r', newline='') as f:
+                reader = csv.reader(f)
+                next(reader, None)
+                for row in reader:
+                    if len(row) > 2 and row[2]:
+                        sentiments_by_chat[row[2]] = row[1]
+                    elif len(row) > 1:
+                        legacy_sentiments.append(row[1])
+
+        replayed = 0
+        legacy_index = 0
+        with open(self.decisions_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for index, row in enumerate(reader):
+                if len(row) < 4:
+                    continue
+                if len(row) > 5 and row[5]:
+                    raw_score = sentiments_by_chat.get(row[5])
+                else:
+                    raw_score = legacy_sentiments[legacy_index] if legacy_index < len(legacy_sentiments) else None
+                    legacy_index += 1
+                if index < skip:
+                    continue
+
+                timestamp, company, lead_source, qualified = row[:4]
+                try:
+                    sentiment_score = int(raw_score)
+                except (TypeError, ValueError):
+                    sentiment_score = None
+                self._add(company, lead_source, timestamp[:10], qualified == 'True', sentiment_score)
+                replayed += 1
+        return replayed
+
+    def record(self, company, lead_source, day, qualified, sentiment_score):
+        """Count one summarized chat, snapshotting to disk when due"""
+        with self.lock:
+            self._add(company, lead_source, day, qualified, sentiment_score)
+            self.updates_since_snapshot += 1
+            due = (self.updates_since_snapshot >= self.snapshot_every
+                   or time.monotonic() - self.last_snapshot >= self.snapshot_interval_seconds)
+            if due:
+                self._snapshot()
+
+    def _snapshot(self):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write then rename so a crash never leaves a half-written snapshot
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'rows_recorded': self.rows_recorded, 'buckets': self.buckets}, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+        self.updates_since_snapshot = 0
+        self.last_snapshot = time.monotonic()
+
+    def snapshot(self):
+        """Force a snapshot to disk"""
+        with self.lock:
+            self._snapshot()
+
+    def get(self, company, lead_source, day):
+        """Constant time lookup of one (company, lead_source, day) bucket"""
+        with self.lock:
+            bucket = dict(self.buckets.get(self._key(company, lead_source, day), _new_bucket()))
+
+        conversations = bucket['conversations']
+        bucket['qualification_rate'] = bucket['qualified'] / conversations if conversations else 0.0
+        bucket['average_sentiment'] = (bucket['sentiment_sum'] / bucket['sentiment_count']
+                                       if bucket['sentiment_count'] else None)
+        return bucket
@@ -0,0 +1,283 @@
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+import requests
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+MOCK_RESPONSES = [
+    "Hi there! I'm excited to help you explore this trucking opportunity. Let me ask you a few questions to see if this might be a good fit.",
+    "That's great! Can you tell me about your CDL and driving experience?",
+    "Excellent! How many years of driving experience do you have?",
+    "Perfect! Are you comfortable being on the road for several nights per week?",
+    "Thank you for sharing that information. Based on what you've told me, I think you'd be a great fit for this position!",
+    "I appreciate your interest. Let me tell you more about the benefits and compensation for this role.",
+    "Do you have any questions about the company or the position?",
+    "That's a great question! Let me provide you with those details."
+]
+
+
+class Backend:
+    """One LLM endpoint with its own latency estimate and circuit breaker"""
+
+    def __init__(self, name, weight=1.0):
+        self.name = name
+        self.weight = weight if weight and weight > 0 else 1.0
+        self.lock = threading.Lock()
+        self.latency = None  # exponentially weighted moving average, seconds
+        self.failures = 0
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    def complete(self, prompt, system_prompt):
+        raise NotImplementedError
+
+    def probe(self):
+        """Cheap health check, returns True when the backend looks usable"""
+        return True
+
+    def try_acquire(self, cooldown_seconds):
+        """Claim the right to send a call; a half-open backend lets exactly one trial through"""
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= cooldown_seconds:
+                self.state = HALF_OPEN
+            if self.state == OPEN:
+                return False
+            if self.state == HALF_OPEN:
+                if self.trial_in_flight:
+                    return False
+                self.trial_in_flight = True
+            return True
+
+    def routing_cost(self):
+        """Lower is better: latency scaled down by weight, untried backends go first"""
+        with self.lock:
+            return (self.latency or 0.0) / self.weight
+
+    def _observe(self, elapsed):
+        if elapsed is not None:
+            self.latency = elapsed if self.latency is None else 0.7 * self.latency + 0.3 * elapsed
+
+    def record_success(self, elapsed):
+        with self.lock:
+            self._observe(elapsed)
+            self.failures = 0
+            self.state = CLOSED
+            self.trial_in_flight = False
+
+    def record_probe_ok(self):
+        with self.lock:
+            # A passing probe earns an open backend one trial call, not a full reset.
+            # It also works off one earlier failure, so occasional blips don't add up
+            # to an ejection, while calls that keep failing still open the circuit.
+            if self.state == OPEN:
+                self.state = HALF_OPEN
+            self.failures = max(0, self.failures - 1)
+
+    def record_failure(self, failure_threshold, elapsed=None):
+        with self.lock:
+            self._observe(elapsed)
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+    def status(self):
+        with self.lock:
+            return {'name': self.name, 'state': self.state, 'latency': self.latency,
+                    'failures': self.failures, 'weight': self.weight}
+
+
+class OpenAIBackend(Backend):
+    """Any OpenAI-compatible /chat/completions endpoint"""
+
+    def __init__(self, name, base_url, model, api_key, weight=1.0, timeout=30,
+                 max_tokens=500, temperature=0.7, health_path='/models'):
+        super().__init__(name, weight)
+        self.base_url = base_url.rstrip('/')
+        self.model = model
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.health_path = health_path
+
+    def _headers(self):
+        return {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+
+    def complete(self, prompt, system_prompt):
+        data = {
+            'model': self.model,
+            'messages': [
+                {'role': 'system', 'content': system_prompt},
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature
+        }
+
+        response = requests.post(
+            f'{self.base_url}/chat/completions',
+            headers=self._headers(),
+            json=data,
+            timeout=self.timeout
+        )
+
+        if response.status_code != 200:
+            raise Exception(f"{self.name} API error: {response.status_code}: {response.text[:200]}")
+        return response.json()['choices'][0]['message']['content']
+
+    def probe(self):
+        response = requests.get(f'{self.base_url}{self.health_path}', headers=self._headers(), timeout=5)
+        return response.status_code == 200
+
+
+class MockBackend(Backend):
+    """Deterministic offline backend: the same prompt always gets the same canned reply"""
+
+    def __init__(self, name='mock', weight=1.0, responses=None):
+        super().__init__(name, weight)
+        self.responses = responses or MOCK_RESPONSES
+
+    def complete(self, prompt, system_prompt):
+        return self.responses[zlib.crc32(prompt.encode('utf-8')) % len(self.responses)]
+
+
+class BackendRegistry:
+    """Routes each LLM call to the healthiest, fastest backend and fails over on errors"""
+
+    def __init__(self, backends, failure_threshold=3, slow_call_seconds=10.0,
+                 cooldown_seconds=30.0, health_check_interval_seconds=15.0):
+        self.backends = backends
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.health_check_interval_seconds = health_check_interval_seconds
+        self.health_thread = None
+        self.stop_event = threading.Event()
+
+    def call(self, prompt, system_prompt=""):
+        """Try available backends cheapest first, raising only when every one has failed"""
+        errors = []
+        attempted = False
+        for backend in sorted(self.backends, key=lambda backend: backend.routing_cost()):
+            # Claimed one at a time, so a half-open trial is only reserved when it is really sent
+            if not backend.try_acquire(self.cooldown_seconds):
+                continue
+            attempted = True
+
+            started = time.monotonic()
+            try:
+                message = backend.complete(prompt, system_prompt)
+            except Exception as e:
+                # Count the time spent too, so a backend that times out stops looking free
+                backend.record_failure(self.failure_threshold, time.monotonic() - started)
+                errors.append(f"{backend.name}: {e}")
+                print(f"LLM: Backend {backend.name} failed, failing over: {e}")
+                continue
+
+            elapsed = time.monotonic() - started
+            if elapsed > self.slow_call_seconds:
+                # Keep the answer but count the slow call against the backend
+                backend.record_failure(self.failure_threshold, elapsed)
+                print(f"LLM: Backend {backend.name} was slow ({elapsed:.1f}s)")
+            else:
+                backend.record_success(elapsed)
+            print(f"LLM: Backend {backend.name} answered in {elapsed:.2f}s")
+            return message
+
+        if not attempted:
+            raise Exception("No LLM backends available, all circuits are open")
+        raise Exception("All LLM backends failed: " + "; ".join(errors))
+
+    def check_health(self):
+        """Probe every backend once, opening or closing circuits on the result"""
+        for backend in self.backends:
+            try:
+                healthy = backend.probe()
+            except Exception:
+                healthy = False
+
+            # Probes only move the circuit, routing latency comes from real calls
+            if healthy:
+                backend.record_probe_ok()
+            else:
+                backend.record_failure(self.failure_threshold)
+                print(f"LLM: Health check failed for backend {backend.name}")
+
+    def _health_loop(self):
+        while not self.stop_event.wait(self.health_check_interval_seconds):
+            self.check_health()
+
+    def start_health_checks(self):
+        """Probe backends in a background daemon thread"""
+        if self.health_thread is None and self.health_check_interval_seconds > 0:
+            self.health_thread = threading.Thread(target=self._health_loop, name='llm-health', daemon=True)
+            self.health_thread.start()
+
+    def stop_health_checks(self):
+        self.stop_event.set()
+
+    def status(self):
+        return [backend.status() for backend in self.backends]
+
+
+def build_registry(server_config):
+    """Create the backend registry from server_config.json"""
+    routing = server_config.get('llm_routing', {})
+    default_key = server_config.get('api_key', '1234')
+    backend_configs = server_config.get('llm_backends') or [
+        {'name': 'openai', 'type': 'openai', 'base_url': 'https://api.openai.com/v1', 'model': 'gpt-3.5-turbo'}
+    ]
+
+    backends = []
+    for config in backend_configs:
+        kind = config.get('type', 'openai')
+        name = config.get('name', kind)
+        weight = config.get('weight', 1.0)
+
+        if kind == 'mock':
+            backends.append(MockBackend(name, weight))
+        elif kind == 'openai':
+            api_key = config.get('api_key', default_key)
+            # Only OpenAI itself needs a real key by default, local stand-ins usually ignore it.
+            # The placeholder key "1234" means no real key is configured.
+            requires_key = config.get('requires_key', urlparse(config['base_url']).hostname == 'api.openai.com')
+            if requires_key and (api_key == '1234' or len(api_key) <= 10):
+                print(f"LLM: Skipping backend {name}, no real API key configured")
+                continue
+            backends.append(OpenAIBackend(
+                name,
+                config['base_url'],
+                config.get('model', 'gpt-3.5-turbo'),
+                api_key,
+                weight=weight,
+                timeout=routing.get('timeout_seconds', 30),
+                max_tokens=config.get('max_tokens', 500),
+                temperature=config.get('temperature', 0.7),
+                health_path=config.get('health_path', '/models')
+            ))
+        else:
+            print(f"LLM: Unknown backend type '{kind}' for {name}, skipping")
+
+    if not backends:
+        print("LLM: Using mock implementation (no real backend configured)")
+        backends.append(MockBackend())
+
+    return BackendRegistry(
+        backends,
+        failure_threshold=routing.get('failure_threshold', 3),
+        slow_call_seconds=routing.get('slow_call_seconds', 10),
+        cooldown_seconds=routing.get('cooldown_seconds', 30),
+        health_check_interval_seconds=routing.get('health_check_interval_seconds', 15)
+    )
@@ -0,0 +1,215 @@
+"""Batch re-scoring of archived conversations.
+
+Re-runs the summary, sentiment and decision steps over every transcript in
+results/audit without touching the live results CSVs. Progress is checkpointed
+to the output CSV row by row, so a killed run picks up where it stopped.
+
+Usage (from the repo root):
+    python -m ScreenpassChat.server_code.rescore --workers 8 --rate 5 --out results/rescore/run1
+"""
+import argparse
+import csv
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from . import sentiment
+from .ServerModule1 import load_config, generate_summary, llm_sentiment, decide_qualification
+
+
+# sentiment_mode says which scorer produced sentiment; local_sentiment is only
+# filled in 'both' mode, where sentiment holds the LLM score
+OUTPUT_FIELDS = ['transcript', 'start_time', 'end_time', 'company', 'lead_source',
+                 'sentiment_mode', 'sentiment', 'local_sentiment', 'qualified', 'reason', 'summary']
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing LLM calls to at most `rate` per second"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait_for = self.next_slot - now
+            self.next_slot = max(self.next_slot, now) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+def parse_transcript(path):
+    """Read an audit file back into its header fields and list of messages"""
+    header = {}
+    messages = []
+    in_body = False
+
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not in_body:
+                if line.startswith('=' * 10):
+                    in_body = True
+                elif ': ' in line:
+                    key, value = line.split(': ', 1)
+                    header[key] = value
+                continue
+
+            if not line:
+                continue
+            if line.startswith('>') or not messages:
+                messages.append(line)
+            else:
+                # Multi-line LLM responses continue the previous message
+                messages[-1] += "\n" + line
+
+    return header, messages
+
+
+def iter_transcripts(audit_dir):
+    """Stream audit transcript paths in a stable order"""
+    names = sorted(entry.name for entry in os.scandir(audit_dir)
+                   if entry.is_file() and entry.name.endswith('.txt'))
+    for name in names:
+        yield os.path.join(audit_dir, name)
+
+
+def load_checkpoint(output_path):
+    """Return the transcripts already rescored in a previous run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    # csv rows end in \r\n while newlines inside quoted summaries are bare \n,
+    # so anything after the last \r\n is a row cut short by a kill
+    with open(output_path, 'rb+') as f:
+        data = f.read()
+        if data and not data.endswith(b'\r\n'):
+            f.truncate(data.rfind(b'\r\n') + 2 if b'\r\n' in data else 0)
+
+    with open(output_path, 'r', newline='') as f:
+        for row in csv.DictReader(f):
+            done.add(row['transcript'])
+    return done
+
+
+def rescore_transcript(path, limiter, sentiment_mode):
+    """Run summary, sentiment and decision for one transcript, taking a rate limit slot per LLM call"""
+    header, messages = parse_transcript(path)
+    conversation_text = "\n".join(messages)
+
+    limiter.acquire()
+    summary = generate_summary(conversation_text)
+
+    # Sentiment goes straight to the scorers so 'both' mode never writes the live agreement CSV
+    local_score = ''
+    if sentiment_mode == 'llm':
+        limiter.acquire()
+        sentiment_score = llm_sentiment(conversation_text)
+    elif sentiment_mode == 'both':
+        local_score = sentiment.score(conversation_text)
+        limiter.acquire()
+        sentiment_score = llm_sentiment(conversation_text)
+    else:
+        sentiment_score = sentiment.score(conversation_text)
+
+    limiter.acquire()
+    qualified, reason = decide_qualification(conversation_text)
+
+    return {
+        'transcript': os.path.basename(path),
+        'start_time': header.get('Start Time', ''),
+        'end_time': header.get('End Time', ''),
+        'company': header.get('Company', ''),
+        'lead_source': header.get('Lead Source', ''),
+        'sentiment_mode': sentiment_mode,
+        'sentiment': sentiment_score,
+        'local_sentiment': local_score,
+        'qualified': qualified,
+        'reason': reason[:100],
+        'summary': summary
+    }
+
+
+def run(audit_dir, out_dir, workers=4, rate=0, limit=None, sentiment_mode=None):
+    """Rescore every transcript not yet in the checkpoint, returns the number processed"""
+    sentiment_mode = sentiment_mode or load_config()['server'].get('sentiment_mode', 'local')
+    os.makedirs(out_dir, exist_ok=True)
+    output_path = os.path.join(out_dir, 'rescored.csv')
+    done = load_checkpoint(output_path)
+    if done:
+        print(f"Resuming: {len(done)} transcripts already rescored in {output_path}")
+
+    limiter = RateLimiter(rate)
+    write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    processed = 0
+    failed = 0
+    started = time.monotonic()
+
+    with open(output_path, 'a', newline='') as f, ThreadPoolExecutor(max_workers=workers) as pool:
+        writer = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+        if write_header:
+            writer.writeheader()
+            f.flush()
+
+        pending = {}
+        todo = (path for path in iter_transcripts(audit_dir) if os.path.basename(path) not in done)
+
+        while True:
+            # Keep a bounded window of work in flight so large archives are streamed
+            while len(pending) < workers * 2:
+                if limit is not None and processed + failed + len(pending) >= limit:
+                    break
+                path = next(todo, None)
+                if path is None:
+                    break
+                pending[pool.submit(rescore_transcript, path, limiter, sentiment_mode)] = path
+
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                path = pending.pop(future)
+                try:
+                    row = future.result()
+                except Exception as e:
+                    failed += 1
+                    print(f"Error rescoring {path}: {e}")
+                    continue
+
+                writer.writerow(row)
+                f.flush()
+                processed += 1
+
+    elapsed = time.monotonic() - started
+    per_minute = processed / elapsed * 60 if elapsed > 0 else 0.0
+    print(f"Rescored {processed} conversations ({failed} failed) in {elapsed:.1f}s, "
+          f"{per_minute:.1f} conversations/minute -> {output_path}")
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-run summary, sentiment and decision over archived conversations")
+    parser.add_argument('--audit-dir', default='results/audit', help="Folder of conversation transcripts")
+    parser.add_argument('--out', default='results/rescore', help="Output folder, also holds the resume checkpoint")
+    parser.add_argument('--workers', type=int, default=4, help="Number of worker threads")
+    parser.add_argument('--rate', type=float, default=0, help="Max LLM calls per second across all workers, 0 for no limit")
+    parser.add_argument('--limit', type=int, default=None, help="Stop after this many transcripts")
+    parser.add_argument('--sentiment-mode', choices=['local', 'llm', 'both'], default=None,
+                        help="Override sentiment_mode from server_config.json")
+    args = parser.parse_args(argv)
+
+    run(args.audit_dir, args.out, workers=args.workers, rate=args.rate, limit=args.limit,
+        sentiment_mode=args.sentiment_mode)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+import re
+
+
+# Screening phases: every session starts in 'screening' and ends in one of the other two
+SCREENING = 'screening'
+QUALIFIED = 'qualified'
+DISQUALIFIED = 'disqualified'
+
+# Number words truckers commonly type instead of digits
+NUMBER_WORDS = {
+    'zero': 0, 'none': 0, 'one': 1, 'two': 2, 'three': 3,
+    'four': 4, 'five': 5, 'six': 6, 'seven': 7, 'eight': 8, 'nine': 9,
+    'ten': 10, 'eleven': 11, 'twelve': 12
+}
+
+# A flat "no" to the question just asked: a short negative standing on its own ("No.", "Nope, sorry")
+# or an explicit refusal ("I can't do that", "I'm not comfortable with that"). Other "I don't ..." /
+# "I can't ..." openers ("I don't see a problem", "I can't complain") say nothing either way.
+BARE_NEGATIVE = re.compile(
+    r"^\s*(?:(?:no|nope|nah|negative|not really|no way)\s*(?:[,.!;]|$)"
+    r"|(?:i can'?t|i cannot|i won'?t|i will not)\s+(?:do|make|handle|manage|be)\b"
+    r"|(?:i'?m not|i am not)\s+(?:ok|okay|comfortable|willing|able|interested)\b"
+    r"|(?:i don'?t|i do not)\s+(?:want|think so|have (?:one|it)\b)"
+    r"|that (?:won'?t|will not|doesn'?t|does not) work)",
+    re.IGNORECASE
+)
+
+# Explicit negative statements that name the topic, e.g. "I don't have a CDL"
+TOPIC_NEGATIVE = r"\b(no|don'?t have|do not have|without|never had|haven'?t got|lost my|expired)\s+(a\s+|my\s+|any\s+|valid\s+)*({})"
+
+AFFIRMATIVE = re.compile(
+    r"^\s*(yes|yeah|yep|yup|sure|of course|absolutely|definitely|correct|i do|i have|i can|that'?s fine|fine|ok|okay)\b",
+    re.IGNORECASE
+)
+
+# Any of these anywhere in a reply means a leading "yes" can't be taken at face value,
+# e.g. "Sure, but my license is suspended right now". Friendly set phrases like
+# "no problem" or "don't mind" are not hedges.
+HEDGED = re.compile(
+    r"\b(?:no(?!\s+(?:problem|worries|issue|doubt)\b)|not(?!\s+a\s+problem\b)|never|but|except|without|"
+    r"suspended|revoked|expired|lost)\b|n't\b(?!\s+(?:mind|wait)\b)",
+    re.IGNORECASE
+)
+
+
+def default_criteria():
+    """Criteria used when questions.json has no screening_criteria section"""
+    return [
+        {'id': 'cdl', 'question': 'Do you have a valid, unexpired CDL?', 'requirement': 'a valid, unexpired CDL',
+         'keywords': ['cdl', 'commercial driver', 'license'], 'check': 'confirm'},
+        {'id': 'yoe', 'question': 'We need a driver with {} years of experience. How many years have you been driving?',
+         'requirement': 'at least {} years of driving experience', 'requirement_key': 'yoe_required',
+         'keywords': ['experience', 'years', 'driving'], 'question_keywords': ['experience', 'how many years', 'how long'],
+         'units': {'year': 1, 'yr': 1, 'month': 0.0833}, 'check': 'minimum'},
+        {'id': 'nights', 'question': 'This job requires being on the road for {} nights a week. Is that okay?',
+         'requirement': 'being on the road {} nights a week', 'requirement_key': 'work_nights_per_week',
+         'keywords': ['night', 'on the road'], 'units': {'night': 1}, 'check': 'minimum', 'yes_no': True}
+    ]
+
+
+def new_screening_state(criteria):
+    """Create the per-session screening state stored on the conversation session"""
+    return {
+        'criteria': {c['id']: {'status': 'open', 'value': None} for c in criteria},
+        'phase': SCREENING,
+        'disqualified': False,
+        'disqualified_by': None,
+        'trucker_turns': 0
+    }
+
+
+def _fill(template, criterion, company_config):
+    key = criterion.get('requirement_key')
+    if key:
+        return template.format(company_config.get(key, ''))
+    return template
+
+
+def requirement_text(criterion, company_config):
+    """Render the human readable requirement with the company-specific value filled in"""
+    return _fill(criterion['requirement'], criterion, company_config)
+
+
+def question_text(criterion, company_config):
+    """Render the screening question with the company-specific value filled in"""
+    return _fill(criterion.get('question', criterion['requirement']), criterion, company_config)
+
+
+def open_questions(state, criteria, company_config):
+    """Questions the trucker has not answered yet"""
+    return [
+        question_text(criterion, company_config)
+        for criterion in criteria
+        if state['criteria'].get(criterion['id'], {}).get('status', 'open') == 'open'
+    ]
+
+
+def established_facts(state, criteria, company_config):
+    """One line per answered question with the captured answer"""
+    facts = []
+    for criterion in criteria:
+        entry = state['criteria'].get(criterion['id'], {})
+        if entry.get('status', 'open') == 'open':
+            continue
+        outcome = 'met' if entry['status'] == 'passed' else 'NOT met'
+        facts.append(f"{requirement_text(criterion, company_config)}: {outcome} (driver answered: {entry['value']})")
+    return facts
+
+
+def _mentions(text, keywords):
+    lowered = (text or '').lower()
+    return any(keyword in lowered for keyword in keywords)
+
+
+def _asked(agent_message, criterion, company_config):
+    """True when the agent's last message actually posed this criterion's question.
+
+    Either the rendered question appears verbatim, or one of the question sentences
+    (ending in '?') names the topic. "We'd love to have you driving with us! Anything
+    else?" does not ask about experience.
+    """
+    lowered = (agent_message or '').lower()
+    if question_text(criterion, company_config).lower() in lowered:
+        return True
+    keywords = criterion.get('question_keywords', criterion.get('keywords', []))
+    questions = [sentence for sentence in re.split(r"(?<=[.!?])\s+", lowered) if sentence.endswith('?')]
+    return any(_mentions(sentence, keywords) for sentence in questions)
+
+
+def _extract_quantity(text, units):
+    """Pull the largest '<number> <unit>' pair out of a message, converted with the unit multiplier.
+
+    Taking the largest keeps "3 years at Swift and 6 years at Werner" from failing on the 3.
+    """
+    unit_pattern = "|".join(re.escape(unit) for unit in units)
+    word_pattern = "|".join(NUMBER_WORDS)
+    matches = re.findall(
+        rf"\b(\d+(?:\.\d+)?|{word_pattern})(\s+and\s+a\s+half)?\s*\+?\s*(?:or so\s+|more\s+)?({unit_pattern})s?\b",
+        text,
+        re.IGNORECASE
+    )
+    if not matches:
+        return None
+    quantities = []
+    for raw, half, unit in matches:
+        raw = raw.lower()
+        number = float(raw) if raw[0].isdigit() else NUMBER_WORDS[raw]
+        if half:
+            number += 0.5
+        quantities.append(number * units[unit.lower()])
+    return round(max(quantities), 2)
+
+
+def _evaluate_criterion(criterion, entry, trucker_message, agent_message, company_config):
+    """Return ('passed' | 'failed' | None, captured value) for one criterion on one turn"""
+    keywords = criterion.get('keywords', [])
+    asked = _asked(agent_message, criterion, company_config)
+    mentioned = _mentions(trucker_message, keywords)
+    if not asked and not mentioned:
+        return None, None
+
+    if criterion.get('check') == 'confirm':
+        topic = "|".join(re.escape(keyword) for keyword in keywords)
+        if re.search(TOPIC_NEGATIVE.format(topic), trucker_message, re.IGNORECASE):
+            return 'failed', trucker_message.strip()
+
+    # Numbers only answer the question when the agent just asked it,
+    # "in 2 years I want to be home" said in passing proves nothing
+    if criterion.get('check') == 'minimum' and asked:
+        quantity = _extract_quantity(trucker_message, criterion.get('units', {}))
+        bare_number = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*\+?\s*[.!]?\s*", trucker_message)
+        if quantity is None and bare_number:
+            quantity = float(bare_number.group(1))
+        if quantity is not None:
+            required = company_config.get(criterion.get('requirement_key'), 0)
+            try:
+                required = float(required)
+            except (TypeError, ValueError):
+                required = 0
+            return ('passed' if quantity >= required else 'failed'), quantity
+
+    # A bare "no" only counts when it replies to a question on this topic,
+    # and never takes back an answer that already passed
+    if asked and entry['status'] == 'open' and BARE_NEGATIVE.search(trucker_message):
+        return 'failed', trucker_message.strip()
+
+    # A plain "yes" answers a yes/no question just asked; "yes, I have a CDL" may also
+    # volunteer a confirm-type answer, as long as nothing in the reply hedges it.
+    # Minimums asked as "how many?" (years of experience) need a number instead.
+    if AFFIRMATIVE.search(trucker_message) and not HEDGED.search(trucker_message):
+        if criterion.get('check') == 'minimum' and criterion.get('yes_no') and asked:
+            # Agreeing to "4 nights a week, is that okay?" meets the company value
+            return 'passed', company_config.get(criterion.get('requirement_key'))
+        if criterion.get('check') == 'confirm':
+            return 'passed', trucker_message.strip()
+
+    return None, None
+
+
+def evaluate_turn(state, criteria, trucker_message, agent_message, company_config):
+    """Update the screening state with the latest trucker reply.
+
+    Returns the criterion that disqualified the candidate on this turn, or None.
+    """
+    state['trucker_turns'] += 1
+    if state['disqualified']:
+        return None
+
+    # The trucker is asking us something, not answering
+    if trucker_message.strip().endswith('?'):
+        return None
+
+    for criterion in criteria:
+        entry = state['criteria'].setdefault(criterion['id'], {'status': 'open', 'value': None})
+        if entry['status'] == 'failed':
+            continue
+
+        status, value = _evaluate_criterion(criterion, entry, trucker_message, agent_message, company_config)
+        if status is None:
+            continue
+
+        entry['status'] = status
+        entry['value'] = value
+        if status == 'failed':
+            state['phase'] = DISQUALIFIED
+            state['disqualified'] = True
+            state['disqualified_by'] = criterion['id']
+            return criterion
+
+    if all(state['criteria'].get(c['id'], {}).get('status') == 'passed' for c in criteria):
+        state['phase'] = QUALIFIED
+
+    return None
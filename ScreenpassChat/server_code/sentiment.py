@@ -0,0 +1,81 @@
+import re
+
+import numpy as np
+
+
+# Word weights from -2 (very unhappy) to 2 (very happy), scored on Trucker turns only
+LEXICON = {
+    'great': 2, 'awesome': 2, 'excellent': 2, 'perfect': 2, 'love': 2, 'amazing': 2, 'excited': 2,
+    'fantastic': 2, 'wonderful': 2, 'thanks': 1, 'thank': 1, 'good': 1, 'nice': 1, 'happy': 1,
+    'glad': 1, 'interested': 1, 'sounds': 1, 'cool': 1, 'helpful': 1, 'like': 1, 'yes': 1,
+    'sure': 1, 'ok': 0.5, 'okay': 0.5, 'fine': 0.5, 'appreciate': 1, 'definitely': 1,
+    'bad': -1, 'confused': -1, 'slow': -1, 'wrong': -1, 'problem': -1, 'issue': -1,
+    'error': -1, 'annoying': -2, 'annoyed': -2, 'frustrated': -2, 'frustrating': -2, 'terrible': -2,
+    'awful': -2, 'hate': -2, 'useless': -2, 'waste': -2, 'ridiculous': -2, 'angry': -2,
+    'worst': -2, 'scam': -2, 'stupid': -2, 'low': -1, 'unfortunately': -1, 'disappointed': -2
+}
+
+# A negator flips the next lexicon word within a few tokens ("not good", "not very good",
+# "don't really like"), so a plain screening "no" carries no sentiment on its own
+NEGATORS = {'no', 'not', "don't", 'dont', "didn't", "isn't", "wasn't", 'never', "can't", 'cannot', "won't"}
+# How many tokens a negator reaches; punctuation ends it sooner ("no, great")
+NEGATION_WINDOW = 3
+PUNCTUATION = set('.,;:!?')
+
+VOCAB = {word: i for i, word in enumerate(LEXICON)}
+WEIGHTS = np.array(list(LEXICON.values()), dtype=float)
+# Negated entries live after the plain ones with the opposite weight
+ALL_WEIGHTS = np.concatenate([WEIGHTS, -WEIGHTS])
+
+TRUCKER_PREFIX = '>Trucker: '
+
+
+def trucker_text(conversation_text):
+    """Keep only what the trucker said"""
+    return "\n".join(
+        line[len(TRUCKER_PREFIX):] for line in conversation_text.split("\n") if line.startswith(TRUCKER_PREFIX)
+    )
+
+
+def _token_indices(text):
+    """Map a text onto lexicon indices, shifting negated words into the second half"""
+    indices = []
+    negate = 0  # tokens the last negator still reaches
+    for token in re.findall(r"[a-z']+|[.,;:!?]", text.lower()):
+        if token in NEGATORS:
+            negate = NEGATION_WINDOW
+            continue
+        if token in PUNCTUATION:
+            negate = 0
+            continue
+        index = VOCAB.get(token)
+        if index is not None:
+            indices.append(index + len(VOCAB) if negate else index)
+            # One negator flips one word, "not bad great" is still great
+            negate = 0
+        elif negate:
+            negate -= 1
+    return indices
+
+
+def score_batch(conversation_texts):
+    """Score many transcripts at once, returns a NumPy array of 1-5 scores"""
+    doc_ids = []
+    indices = []
+    for doc_id, text in enumerate(conversation_texts):
+        hits = _token_indices(trucker_text(text))
+        indices.extend(hits)
+        doc_ids.extend([doc_id] * len(hits))
+
+    totals = np.bincount(
+        np.asarray(doc_ids, dtype=int),
+        weights=ALL_WEIGHTS[np.asarray(indices, dtype=int)],
+        minlength=len(conversation_texts)
+    )
+    # Squash the summed weights onto the 1-5 scale, a chat with no signal stays neutral at 3
+    return np.clip(np.rint(3 + 2 * np.tanh(totals / 3)), 1, 5).astype(int)
+
+
+def score(conversation_text):
+    """Score a single transcript from 1 to 5"""
+    return int(score_batch([conversation_text])[0])
@@ -0,0 +1,76 @@
+import csv
+
+from ScreenpassChat.server_code.funnel import FunnelAggregates
+
+
+def write_rows(decisions_path, sentiment_path, rows):
+    with open(decisions_path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        for timestamp, company, lead_source, qualified, _ in rows:
+            writer.writerow([timestamp, company, lead_source, qualified, 'reason'])
+    with open(sentiment_path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        for timestamp, _, _, _, score in rows:
+            writer.writerow([timestamp, score])
+
+
+def make_aggregates(tmp_path):
+    decisions = tmp_path / 'decisions.csv'
+    sentiments = tmp_path / 'sentiment.csv'
+    decisions.write_text("timestamp,company,lead_source,qualified,reason\n")
+    sentiments.write_text("start_ts,sentiment\n")
+    aggregates = FunnelAggregates(str(tmp_path / 'snapshot.json'), str(decisions), str(sentiments))
+    return aggregates, str(decisions), str(sentiments)
+
+
+def test_cold_start_rebuilds_from_csvs(tmp_path):
+    aggregates, decisions, sentiments = make_aggregates(tmp_path)
+    write_rows(decisions, sentiments, [
+        ('2025-08-13T04:26:23', 'companyA', 'google', True, 5),
+        ('2025-08-13T05:26:23', 'companyA', 'google', False, 3),
+    ])
+
+    aggregates.load()
+    stats = aggregates.get('companyA', 'google', '2025-08-13')
+
+    assert stats['conversations'] == 2
+    assert stats['qualification_rate'] == 0.5
+    assert stats['average_sentiment'] == 4.0
+
+
+def test_snapshot_then_replay_counts_each_chat_once(tmp_path):
+    aggregates, decisions, sentiments = make_aggregates(tmp_path)
+    aggregates.load()
+    write_rows(decisions, sentiments, [('2025-08-13T04:26:23', 'companyA', 'google', True, 5)])
+    aggregates.record('companyA', 'google', '2025-08-13', True, 5)
+    aggregates.snapshot()
+
+    # A chat written after the snapshot is picked up from the CSVs on the next cold start
+    write_rows(decisions, sentiments, [('2025-08-13T05:26:23', 'companyA', 'google', False, 1)])
+    restarted = FunnelAggregates(aggregates.snapshot_path, decisions, sentiments)
+    restarted.load()
+    stats = restarted.get('companyA', 'google', '2025-08-13')
+
+    assert stats['conversations'] == 2
+    assert stats['sentiment_sum'] == 6
+    assert restarted.rows_recorded == 2
+
+
+def test_rebuild_pairs_interleaved_rows_by_chat_id(tmp_path):
+    aggregates, decisions, sentiments = make_aggregates(tmp_path)
+    # Two chats finished in a different order in each file, and a third failed between its writes
+    with open(sentiments, 'a', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['2025-08-13T04:26:20', 1, 'chat-c'])
+        writer.writerow(['2025-08-13T04:26:21', 5, 'chat-b'])
+        writer.writerow(['2025-08-13T04:26:22', 2, 'chat-a'])
+    with open(decisions, 'a', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['2025-08-13T04:26:23', 'companyA', 'google', True, 'reason', 'chat-a'])
+        writer.writerow(['2025-08-13T04:26:24', 'companyB', 'google', False, 'reason', 'chat-b'])
+
+    aggregates.load()
+
+    assert aggregates.get('companyA', 'google', '2025-08-13')['average_sentiment'] == 2.0
+    assert aggregates.get('companyB', 'google', '2025-08-13')['average_sentiment'] == 5.0
+    assert aggregates.rows_recorded == 2
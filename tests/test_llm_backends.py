@@ -0,0 +1,170 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ScreenpassChat.server_code import llm_backends
+from ScreenpassChat.server_code.llm_backends import Backend, BackendRegistry, MockBackend, OpenAIBackend, build_registry
+
+
+class FailingBackend(Backend):
+    def __init__(self, name, delay=0.0):
+        super().__init__(name)
+        self.delay = delay
+        self.calls = 0
+
+    def complete(self, prompt, system_prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        raise Exception("down")
+
+
+def test_failed_calls_record_latency():
+    slow = FailingBackend('slow', delay=0.05)
+    registry = BackendRegistry([slow, MockBackend()], failure_threshold=5)
+
+    registry.call('hi')
+
+    assert slow.latency is not None and slow.latency >= 0.05
+    assert registry.call('hi') in llm_backends.MOCK_RESPONSES
+    # The timed-out backend now costs more than the mock, so it is no longer tried first
+    assert slow.calls == 1
+
+
+def test_half_open_allows_a_single_trial():
+    backend = FailingBackend('flaky')
+    backend.state = llm_backends.OPEN
+    backend.opened_at = time.monotonic() - 60
+
+    assert backend.try_acquire(cooldown_seconds=30)
+    assert backend.state == llm_backends.HALF_OPEN
+    assert not backend.try_acquire(cooldown_seconds=30)
+
+    backend.record_failure(failure_threshold=3)
+    assert backend.state == llm_backends.OPEN
+    assert not backend.trial_in_flight
+
+
+def test_all_open_raises():
+    backend = FailingBackend('down')
+    backend.state = llm_backends.OPEN
+    backend.opened_at = time.monotonic()
+
+    with pytest.raises(Exception, match="all circuits are open"):
+        BackendRegistry([backend]).call('hi')
+
+
+def test_local_stand_in_does_not_need_a_real_key():
+    registry = build_registry({'api_key': '1234', 'llm_backends': [
+        {'name': 'local', 'base_url': 'http://localhost:9000/v1'}
+    ]})
+
+    assert [backend.name for backend in registry.backends] == ['local']
+
+
+def test_openai_without_a_real_key_falls_back_to_mock():
+    registry = build_registry({'api_key': '1234'})
+
+    assert [backend.name for backend in registry.backends] == ['mock']
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible endpoint, broken servers answer 500 to everything"""
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(body).encode('utf-8'))
+
+    def do_GET(self):
+        self.server.probes += 1
+        if self.server.broken or self.path != '/v1/health':
+            self._send(500, {'error': 'down'})
+        else:
+            self._send(200, {'data': []})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.calls += 1
+        if self.server.broken:
+            self._send(500, {'error': 'down'})
+        else:
+            self._send(200, {'choices': [{'message': {'content': f"{self.server.name}: {body['messages'][1]['content']}"}}]})
+
+
+@pytest.fixture
+def stand_in():
+    servers = []
+
+    def start(name, broken=False):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        server.name, server.broken, server.calls, server.probes = name, broken, 0, 0
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def backend_config(server, weight=1):
+    return {'name': server.name, 'base_url': f'http://127.0.0.1:{server.server_port}/v1',
+            'weight': weight, 'health_path': '/health'}
+
+
+def test_openai_backend_talks_to_a_stand_in(stand_in):
+    server = stand_in('healthy')
+    backend = OpenAIBackend('healthy', f'http://127.0.0.1:{server.server_port}/v1', 'model', 'key', health_path='/health')
+
+    assert backend.complete('hi', 'system') == 'healthy: hi'
+    assert backend.probe()
+    server.broken = True
+    assert not backend.probe()
+
+
+def test_registry_fails_over_and_opens_the_circuit(stand_in):
+    broken = stand_in('broken', broken=True)
+    healthy = stand_in('healthy')
+    # The broken backend is weighted to look cheapest so it is tried first
+    registry = build_registry({'api_key': '1234', 'llm_routing': {'failure_threshold': 2, 'cooldown_seconds': 60},
+                               'llm_backends': [backend_config(broken, weight=100), backend_config(healthy)]})
+    registry.backends[0].latency = registry.backends[1].latency = 0.0
+
+    for _ in range(4):
+        assert registry.call('hi') == 'healthy: hi'
+
+    assert broken.calls == 2
+    assert registry.backends[0].state == llm_backends.OPEN
+    assert registry.backends[1].state == llm_backends.CLOSED
+
+
+def test_check_health_uses_health_path(stand_in):
+    broken = stand_in('broken', broken=True)
+    healthy = stand_in('healthy')
+    registry = build_registry({'api_key': '1234', 'llm_routing': {'failure_threshold': 2},
+                               'llm_backends': [backend_config(broken), backend_config(healthy)]})
+
+    registry.check_health()
+    registry.check_health()
+
+    assert (broken.probes, healthy.probes) == (2, 2)
+    assert [backend.state for backend in registry.backends] == [llm_backends.OPEN, llm_backends.CLOSED]
+
+
+def test_passing_probes_work_off_earlier_failures():
+    backend = FailingBackend('flaky')
+    backend.record_failure(failure_threshold=3)
+    backend.record_failure(failure_threshold=3)
+
+    BackendRegistry([backend]).check_health()
+
+    assert backend.failures == 1
+    assert backend.state == llm_backends.CLOSED
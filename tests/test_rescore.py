@@ -0,0 +1,105 @@
+import csv
+import sys
+import types
+
+import pytest
+
+try:
+    import anvil.server  # noqa: F401
+except ImportError:
+    # The server module only needs anvil for its decorators outside the Anvil runtime
+    anvil = types.ModuleType('anvil')
+    anvil.server = types.ModuleType('anvil.server')
+    anvil.server.callable = lambda function: function
+    sys.modules['anvil'] = anvil
+    sys.modules['anvil.server'] = anvil.server
+
+from ScreenpassChat.server_code import ServerModule1, rescore
+from ScreenpassChat.server_code.llm_backends import BackendRegistry, MockBackend
+
+
+TRANSCRIPT = """Conversation Log
+Start Time: 2025-08-13 00:24:43.407000-04:00
+End Time: 2025-08-13 00:26:23.485000-04:00
+Lead Source: google
+Company: {company}
+==================================================
+
+>Screenpass: Do you have a valid CDL?
+>Trucker: Yes I do
+>Screenpass: Great! Here is what the job offers:
+- $30/hour
+- Home every weekend
+>Trucker: Sounds good, thanks
+"""
+
+
+@pytest.fixture(autouse=True)
+def mock_llm(monkeypatch):
+    registry = BackendRegistry([MockBackend()], health_check_interval_seconds=0)
+    monkeypatch.setattr(ServerModule1, 'llm_registry', registry)
+
+
+def make_audit_dir(tmp_path, count):
+    audit_dir = tmp_path / 'audit'
+    audit_dir.mkdir()
+    for i in range(count):
+        (audit_dir / f'conversation_{i:02d}.txt').write_text(TRANSCRIPT.format(company=f'company{i}'))
+    return audit_dir
+
+
+def read_rows(out_dir):
+    with open(out_dir / 'rescored.csv', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_parse_transcript_joins_multi_line_messages(tmp_path):
+    audit_dir = make_audit_dir(tmp_path, 1)
+
+    header, messages = rescore.parse_transcript(str(audit_dir / 'conversation_00.txt'))
+
+    assert header['Company'] == 'company0'
+    assert header['Lead Source'] == 'google'
+    assert messages == [
+        ">Screenpass: Do you have a valid CDL?",
+        ">Trucker: Yes I do",
+        ">Screenpass: Great! Here is what the job offers:\n- $30/hour\n- Home every weekend",
+        ">Trucker: Sounds good, thanks",
+    ]
+
+
+def test_load_checkpoint_truncates_a_half_written_row(tmp_path):
+    output_path = tmp_path / 'rescored.csv'
+    output_path.write_bytes(b'transcript,summary\r\na.txt,"line one\nline two"\r\nb.txt,"cut sh')
+
+    done = rescore.load_checkpoint(str(output_path))
+
+    assert done == {'a.txt'}
+    assert output_path.read_bytes() == b'transcript,summary\r\na.txt,"line one\nline two"\r\n'
+
+
+def test_run_resumes_and_skips_done_transcripts(tmp_path):
+    audit_dir = make_audit_dir(tmp_path, 4)
+    out_dir = tmp_path / 'out'
+
+    assert rescore.run(str(audit_dir), str(out_dir), workers=2, limit=2, sentiment_mode='local') == 2
+    assert len(read_rows(out_dir)) == 2
+
+    assert rescore.run(str(audit_dir), str(out_dir), workers=2, sentiment_mode='local') == 2
+    rows = read_rows(out_dir)
+    assert sorted(row['transcript'] for row in rows) == [f'conversation_{i:02d}.txt' for i in range(4)]
+    assert {row['sentiment_mode'] for row in rows} == {'local'}
+
+    assert rescore.run(str(audit_dir), str(out_dir), sentiment_mode='local') == 0
+
+
+def test_limit_flag_caps_the_run(tmp_path):
+    audit_dir = make_audit_dir(tmp_path, 3)
+    out_dir = tmp_path / 'out'
+
+    rescore.main(['--audit-dir', str(audit_dir), '--out', str(out_dir), '--limit', '1', '--sentiment-mode', 'both'])
+
+    rows = read_rows(out_dir)
+    assert len(rows) == 1
+    assert rows[0]['sentiment_mode'] == 'both'
+    assert rows[0]['local_sentiment'] != ''
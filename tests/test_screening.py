@@ -0,0 +1,130 @@
+import json
+import os
+
+import pytest
+
+from ScreenpassChat.server_code import screening
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, 'roles', 'questions.json')) as f:
+    CRITERIA = json.load(f)['screening_criteria']
+
+with open(os.path.join(ROOT, 'roles', 'companyA.json')) as f:
+    COMPANY_A = json.load(f)
+
+ASK_CDL = "Do you have a valid, unexpired Commercial Driver's License (CDL)?"
+ASK_YOE = "We need a driver with 4 years of experience. How many years have you been driving?"
+ASK_NIGHTS = "This job requires being on the road for 4 nights a week. Is that okay?"
+
+
+def evaluate(trucker_message, agent_message):
+    state = screening.new_screening_state(CRITERIA)
+    failed = screening.evaluate_turn(state, CRITERIA, trucker_message, agent_message, COMPANY_A)
+    return state, failed
+
+
+@pytest.mark.parametrize('agent_message, trucker_message', [
+    # Questions from the trucker are never answers
+    ("Hi! Can I ask you a few quick questions?", "What does the wage look like for someone with 2 years experience?"),
+    (ASK_YOE, "What does the wage look like for someone with 2 years experience?"),
+    # Numbers said in passing don't answer a question nobody asked
+    (ASK_CDL, "In 2 years I want to be home every night"),
+    # The largest quantity counts, not the first one
+    (ASK_YOE, "I drove 3 years at Swift and 6 years at Werner"),
+    (ASK_YOE, "I've had my CDL for a year, but drove 8 years before"),
+    # "No" opening a longer sentence is not a flat no
+    (ASK_CDL, "No accidents, 5 years driving"),
+    (ASK_NIGHTS, "No problem"),
+    (ASK_NIGHTS, "I don't mind"),
+    # "I don't ..." / "I can't ..." openers that aren't refusals
+    (ASK_NIGHTS, "I don't see a problem with that"),
+    (ASK_NIGHTS, "I don't have a problem with that at all"),
+    (ASK_NIGHTS, "I can't complain, that works"),
+    (ASK_YOE, "I don't remember exactly"),
+    # Mentioning driving isn't asking about experience
+    ("We'd love to have you driving with us! Anything else?", "No, that's all. Thanks!"),
+])
+def test_ordinary_replies_do_not_disqualify(agent_message, trucker_message):
+    state, failed = evaluate(trucker_message, agent_message)
+
+    assert failed is None
+    assert not state['disqualified']
+
+
+@pytest.mark.parametrize('agent_message, trucker_message, criterion_id', [
+    (ASK_CDL, "No", 'cdl'),
+    (ASK_CDL, "Nope, sorry", 'cdl'),
+    ("Tell me about yourself", "I don't have a CDL yet", 'cdl'),
+    (ASK_YOE, "2 years", 'yoe'),
+    (ASK_YOE, "3", 'yoe'),
+    (ASK_YOE, "about six months", 'yoe'),
+    (ASK_NIGHTS, "I can't do that", 'nights'),
+    (ASK_NIGHTS, "Only 2 nights a week", 'nights'),
+])
+def test_clear_failures_disqualify(agent_message, trucker_message, criterion_id):
+    state, failed = evaluate(trucker_message, agent_message)
+
+    assert failed is not None
+    assert failed['id'] == criterion_id
+    assert state['phase'] == screening.DISQUALIFIED
+
+
+def test_bare_negative_never_downgrades_a_passed_answer():
+    state = screening.new_screening_state(CRITERIA)
+    screening.evaluate_turn(state, CRITERIA, "10 years", ASK_YOE, COMPANY_A)
+    for agent_message in ["We'd love to have you driving with us! Anything else?", ASK_YOE]:
+        failed = screening.evaluate_turn(state, CRITERIA, "No, that's all. Thanks!", agent_message, COMPANY_A)
+
+        assert failed is None
+        assert state['criteria']['yoe'] == {'status': 'passed', 'value': 10.0}
+
+
+def test_and_a_half_adds_to_the_number():
+    state, failed = evaluate("About 5 and a half years", ASK_YOE)
+
+    assert failed is None
+    assert state['criteria']['yoe'] == {'status': 'passed', 'value': 5.5}
+
+
+def test_largest_quantity_is_captured():
+    state, _ = evaluate("I drove 3 years at Swift and 6 years at Werner", ASK_YOE)
+
+    assert state['criteria']['yoe'] == {'status': 'passed', 'value': 6.0}
+
+
+@pytest.mark.parametrize('trucker_message', ["Yes that's fine", "Sure", "Okay!"])
+def test_affirmative_answers_an_asked_minimum_question(trucker_message):
+    state, failed = evaluate(trucker_message, ASK_NIGHTS)
+
+    assert failed is None
+    assert state['criteria']['nights'] == {'status': 'passed', 'value': 4}
+    assert ASK_NIGHTS not in screening.open_questions(state, CRITERIA, COMPANY_A)
+
+
+@pytest.mark.parametrize('agent_message', [
+    ASK_YOE,
+    "Are you comfortable driving long hours?",
+    "Can you tell me about your CDL and driving experience?",
+])
+def test_yes_does_not_answer_years_of_experience(agent_message):
+    state, failed = evaluate("Yes", agent_message)
+
+    assert failed is None
+    assert state['criteria']['yoe'] == {'status': 'open', 'value': None}
+
+
+def test_hedged_affirmative_does_not_confirm_other_questions():
+    state, _ = evaluate("Sure, but my license is suspended right now", ASK_NIGHTS)
+
+    assert state['criteria']['cdl']['status'] == 'open'
+    assert state['criteria']['nights']['status'] == 'open'
+
+
+def test_all_answers_reach_qualified_phase():
+    state = screening.new_screening_state(CRITERIA)
+    for agent_message, trucker_message in [(ASK_CDL, "Yes I do"), (ASK_YOE, "10 years"), (ASK_NIGHTS, "Sure, no problem")]:
+        screening.evaluate_turn(state, CRITERIA, trucker_message, agent_message, COMPANY_A)
+
+    assert state['phase'] == screening.QUALIFIED
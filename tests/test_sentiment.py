@@ -0,0 +1,30 @@
+import pytest
+
+from ScreenpassChat.server_code import sentiment
+
+
+def test_no_problem_is_positive():
+    assert sentiment.score(">Trucker: no problem") > 3
+
+
+@pytest.mark.parametrize('text', [">Trucker: not very good", ">Trucker: not really happy", ">Trucker: I don't really like it"])
+def test_negation_reaches_past_intensifiers(text):
+    assert sentiment.score(text) < 3
+
+
+def test_punctuation_ends_negation():
+    assert sentiment.score(">Trucker: no, great") > 3
+
+
+def test_plain_no_is_neutral():
+    assert sentiment.score(">Screenpass: Do you have a CDL?\n>Trucker: no") == 3
+
+
+def test_only_trucker_turns_are_scored():
+    assert sentiment.score(">Screenpass: This is awful and terrible\n>Trucker: ok") == 3
+
+
+def test_batch_matches_single_scores():
+    texts = [">Trucker: this is great, thanks!", ">Trucker: this is annoying and useless", ">Trucker: test123"]
+
+    assert list(sentiment.score_batch(texts)) == [sentiment.score(text) for text in texts]